@@ -0,0 +1,8 @@
+from services.knowledge_base import KnowledgeBase, load_corpus, INDEX_PATH, VECTORS_PATH
+
+# Build the advisory index offline; the chat service memory-maps it at startup
+passages = load_corpus()
+kb = KnowledgeBase.build(passages)
+kb.save(INDEX_PATH, VECTORS_PATH)
+
+print(f"Indexed {len(passages)} passages ({len(kb.postings)} terms) into {INDEX_PATH} and {VECTORS_PATH}")
@@ -0,0 +1,73 @@
+import tensorflow as tf
+import numpy as np
+from PIL import Image
+import argparse
+import time
+from utils.disease_helpers import split_dataset, run_model
+
+# Command line options
+parser = argparse.ArgumentParser(description="Measure accuracy and CPU time of cascade disease inference")
+parser.add_argument("--dataset", default="dataset/plantvillage/", help="Path to the dataset")
+parser.add_argument("--small-model", default="ml/disease_model_small.tflite")
+parser.add_argument("--full-model", default="ml/disease_model.tflite")
+parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.85,0.9,0.95,0.98",
+                    help="Comma separated first-stage confidence thresholds to evaluate")
+parser.add_argument("--tolerance", type=float, default=0.01, help="Maximum allowed accuracy drop vs the full model")
+parser.add_argument("--limit", type=int, default=0, help="Evaluate at most this many validation images (0 = all)")
+args = parser.parse_args()
+
+def load_interpreter(path):
+    model_interpreter = tf.lite.Interpreter(model_path=path)
+    model_interpreter.allocate_tensors()
+    return model_interpreter
+
+# Same held-out split as train_disease_model.py
+class_names, _, (val_paths, val_labels) = split_dataset(args.dataset)
+if args.limit:
+    val_paths, val_labels = val_paths[:args.limit], val_labels[:args.limit]
+
+small_interpreter = load_interpreter(args.small_model)
+full_interpreter = load_interpreter(args.full_model)
+
+# Run both stages once per image; thresholds are then swept without re-running inference
+n = len(val_paths)
+small_pred, small_conf, full_pred = np.zeros(n, dtype=int), np.zeros(n), np.zeros(n, dtype=int)
+small_ms, full_ms = np.zeros(n), np.zeros(n)
+y_true = np.array(val_labels)
+for i, path in enumerate(val_paths):
+    image = Image.open(path).convert('RGB')
+    start = time.perf_counter()
+    output = run_model(small_interpreter, image)
+    small_ms[i] = (time.perf_counter() - start) * 1000
+    small_pred[i], small_conf[i] = np.argmax(output), np.max(output)
+    start = time.perf_counter()
+    output = run_model(full_interpreter, image)
+    full_ms[i] = (time.perf_counter() - start) * 1000
+    full_pred[i] = np.argmax(output)
+
+full_accuracy = float(np.mean(full_pred == y_true))
+print(f"Validation images: {n}")
+print(f"Full model:  accuracy {full_accuracy:.4f}, avg {full_ms.mean():.2f} ms/image")
+print(f"Small model: accuracy {np.mean(small_pred == y_true):.4f}, avg {small_ms.mean():.2f} ms/image")
+print()
+print(f"{'threshold':>9} {'accuracy':>9} {'drop':>7} {'small hits':>11} {'full hits':>10} {'ms/image':>9} {'speedup':>8}")
+
+best = None
+for threshold in [float(t) for t in args.thresholds.split(",")]:
+    accepted = small_conf >= threshold
+    cascade_pred = np.where(accepted, small_pred, full_pred)
+    accuracy = float(np.mean(cascade_pred == y_true))
+    # Escalated images pay for both stages
+    cascade_ms = small_ms.mean() + full_ms[~accepted].sum() / n
+    drop = full_accuracy - accuracy
+    print(f"{threshold:>9.2f} {accuracy:>9.4f} {drop:>7.4f} {int(accepted.sum()):>11} {int((~accepted).sum()):>10} "
+          f"{cascade_ms:>9.2f} {full_ms.mean() / cascade_ms:>7.2f}x")
+    if drop <= args.tolerance and (best is None or cascade_ms < best[1]):
+        best = (threshold, cascade_ms)
+
+print()
+if best:
+    print(f"Fastest threshold within tolerance {args.tolerance}: {best[0]} "
+          f"(set DISEASE_CASCADE_THRESHOLD={best[0]})")
+else:
+    print(f"No threshold keeps accuracy within tolerance {args.tolerance}; keep the cascade disabled (DISEASE_CASCADE=0)")
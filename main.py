@@ -1,12 +1,16 @@
 from fastapi import FastAPI
 from routers import recommendations, disease, chat, satellite, market
 from services.cache import init_cache
+from services.knowledge_base import init_knowledge_base
 
 app = FastAPI(title="AI Crop Recommendation Backend")
 
 # Initialize cache
 init_cache()
 
+# Load the advisory knowledge base index
+init_knowledge_base()
+
 app.include_router(recommendations.router)
 app.include_router(disease.router)
 app.include_router(chat.router)
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from models.schemas import ChatRequest, ChatResponse
+from services.chat_service import get_chat_response
 import logging
 
 router = APIRouter()
@@ -8,15 +9,10 @@ logger = logging.getLogger(__name__)
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_grok(request: ChatRequest):
     try:
-        message = request.message
-        crop = request.context.get("crop", "unknown") if request.context else "unknown"
         language = request.language
 
-        # Mock response (replace with actual model logic if available)
-        response_text = (
-            f"Based on your query '{message}', I recommend checking soil health and consulting local agricultural guidelines. "
-            f"For {crop}, consider organic fertilizers. Relevant government schemes: PM-KISAN, National Mission for Sustainable Agriculture."
-        )
+        # Response grounded in the advisory knowledge base
+        response_text = get_chat_response(request.message, request.context, language)
 
         return {
             "response": response_text,
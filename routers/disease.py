@@ -1,6 +1,6 @@
 from fastapi import APIRouter, UploadFile, File
 from pydantic import BaseModel
-from services.disease_detection import predict_disease
+from services.disease_detection import predict_disease, get_cascade_stats
 from services.cache import save_to_cache, get_from_cache
 import hashlib
 
@@ -10,6 +10,7 @@ class DiseaseResponse(BaseModel):
     disease: str
     confidence: float
     recommendation: str
+    stage: str = "full"
 
 @router.post("/", response_model=DiseaseResponse)
 async def detect_disease(file: UploadFile = File(...)):
@@ -26,4 +27,9 @@ async def detect_disease(file: UploadFile = File(...)):
     # Compute and cache
     result = await predict_disease(file)
     save_to_cache("disease", request, result)
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/cascade/stats")
+def cascade_stats():
+    # Per-stage hit counts and average inference time since startup
+    return get_cascade_stats()
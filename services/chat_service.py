@@ -1,45 +1,60 @@
 import requests
 from fastapi import HTTPException
+from services.advisory_data import gov_schemes
+from services.knowledge_base import search_knowledge_base
+from services.translation_memory import TranslationMemory
 
-# Placeholder: Government schemes database
-gov_schemes = {
-    "Wheat": ["PM-KISAN", "Crop Insurance Scheme"],
-    "Rice": ["PM-KISAN", "National Mission for Sustainable Agriculture"],
-    "Maize": ["PM-KISAN", "Soil Health Card Scheme"],
-    "Barley": ["PM-KISAN", "Crop Insurance Scheme"]
-}
-
-# Placeholder: Mock translation function (replace with real API like Google Translate)
-def translate_text(text: str, target_language: str) -> str:
+# Placeholder: Mock batch translation backend (replace with real API like Google Translate)
+def mock_translate_batch(segments: list, target_language: str) -> list:
     # Mock translations for common Indian languages
-    translations = {
-        "hi": f"[Hindi] {text}",  # Replace with actual translation
-        "ta": f"[Tamil] {text}",
-        "te": f"[Telugu] {text}",
-        "mr": f"[Marathi] {text}"
+    prefixes = {
+        "hi": "[Hindi]",  # Replace with actual translation
+        "ta": "[Tamil]",
+        "te": "[Telugu]",
+        "mr": "[Marathi]"
     }
-    return translations.get(target_language, text)  # Default to English if language not found
+    return [f"{prefixes[target_language]} {segment}" for segment in segments]
+
+SUPPORTED_LANGUAGES = {"hi", "ta", "te", "mr"}
+
+# Translated sentences are reused across responses, so repeated advice costs no backend calls
+translation_memory = TranslationMemory(backend=mock_translate_batch)
+
+def translate_text(text: str, target_language: str) -> str:
+    if target_language not in SUPPORTED_LANGUAGES:
+        return text  # Default to English if language not found
+    return translation_memory.translate(text, target_language)
+
+def translate_response(pieces: list, target_language: str) -> str:
+    # pieces are (text, persist) pairs; text echoing the user's message is translated but not stored
+    if target_language not in SUPPORTED_LANGUAGES:
+        return " ".join(text for text, _ in pieces)  # Default to English if language not found
+    return " ".join(translation_memory.translate_pieces(pieces, target_language))
 
 def get_chat_response(message: str, context: dict = None, language: str = "en"):
     try:
         # Extract crop from context if available
         crop = context.get("crop", None) if context else None
         schemes = gov_schemes.get(crop, ["PM-KISAN"]) if crop else ["PM-KISAN"]
+
+        # Retrieve the most relevant advisory passages to keep the prompt small
+        passages = search_knowledge_base(f"{message} {crop}" if crop else message, k=3)
         
         # Mock LLM response with scheme integration
-        response = (
-            f"Based on your query '{message}', I recommend checking soil health and consulting local agricultural guidelines. "
-            f"Relevant government schemes for {'your crop' if crop else 'general farming'}: {', '.join(schemes)}."
-        )
+        query_echo = f"Based on your query '{message}', I recommend checking soil health and consulting local agricultural guidelines."
+        advice = f"Relevant government schemes for {'your crop' if crop else 'general farming'}: {', '.join(schemes)}."
+        if passages:
+            advice += " " + " ".join(p["text"] for p in passages)
         
-        # Translate response to target language
-        translated_response = translate_text(response, language)
+        # Translate response to target language; only the reusable advice is kept in the translation memory
+        translated_response = translate_response([(query_echo, False), (advice, True)], language)
         
         # Uncomment for real LLM integration
         """
         payload = {
             "prompt": f"Farmer query: {message}. Context: {context if context else 'No context provided'}. "
-                      f"Include these government schemes: {', '.join(schemes)}",
+                      f"Include these government schemes: {', '.join(schemes)}. "
+                      f"Reference notes: {' '.join(p['text'] for p in passages)}",
             "max_tokens": 100,
             "temperature": 0.7
         }
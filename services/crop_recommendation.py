@@ -3,36 +3,11 @@ import pandas as pd
 from models.schemas import CropRequest
 from services.satellite_data import fetch_soil_data  # Correct import
 from services.market_price import fetch_market_price
+from services.advisory_data import crop_data
 
 # Load the pre-trained RandomForest model
 model = joblib.load("ml/crop_model.pkl")
 
-# Crop-specific yield and sustainability data (capitalized keys to match dataset)
-crop_data = {
-    "Rice": {"base_yield": 1500, "sustainability_factor": 0.7, "cost_per_kg": 25},
-    "Maize": {"base_yield": 1000, "sustainability_factor": 0.85, "cost_per_kg": 15},
-    "Chickpea": {"base_yield": 800, "sustainability_factor": 0.9, "cost_per_kg": 30},
-    "Kidneybeans": {"base_yield": 700, "sustainability_factor": 0.88, "cost_per_kg": 35},
-    "Pigeonpeas": {"base_yield": 750, "sustainability_factor": 0.87, "cost_per_kg": 32},
-    "Mothbeans": {"base_yield": 600, "sustainability_factor": 0.86, "cost_per_kg": 28},
-    "Mungbean": {"base_yield": 650, "sustainability_factor": 0.89, "cost_per_kg": 30},
-    "Blackgram": {"base_yield": 700, "sustainability_factor": 0.88, "cost_per_kg": 33},
-    "Lentil": {"base_yield": 600, "sustainability_factor": 0.9, "cost_per_kg": 34},
-    "Pomegranate": {"base_yield": 900, "sustainability_factor": 0.85, "cost_per_kg": 40},
-    "Banana": {"base_yield": 1200, "sustainability_factor": 0.75, "cost_per_kg": 20},
-    "Mango": {"base_yield": 800, "sustainability_factor": 0.8, "cost_per_kg": 45},
-    "Grapes": {"base_yield": 850, "sustainability_factor": 0.82, "cost_per_kg": 50},
-    "Watermelon": {"base_yield": 1100, "sustainability_factor": 0.78, "cost_per_kg": 18},
-    "Muskmelon": {"base_yield": 1000, "sustainability_factor": 0.79, "cost_per_kg": 20},
-    "Apple": {"base_yield": 900, "sustainability_factor": 0.83, "cost_per_kg": 60},
-    "Orange": {"base_yield": 950, "sustainability_factor": 0.84, "cost_per_kg": 55},
-    "Papaya": {"base_yield": 1100, "sustainability_factor": 0.76, "cost_per_kg": 25},
-    "Coconut": {"base_yield": 500, "sustainability_factor": 0.9, "cost_per_kg": 35},
-    "Cotton": {"base_yield": 700, "sustainability_factor": 0.7, "cost_per_kg": 30},
-    "Jute": {"base_yield": 800, "sustainability_factor": 0.72, "cost_per_kg": 28},
-    "Coffee": {"base_yield": 600, "sustainability_factor": 0.85, "cost_per_kg": 50}
-}
-
 def predict_crop(input_data: dict, use_satellite: bool = False, coordinates: dict = None, date_range: dict = None):
     # Use satellite data if requested
     if use_satellite and coordinates and date_range:
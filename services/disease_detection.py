@@ -6,6 +6,9 @@ from fastapi import UploadFile, HTTPException
 import logging
 import mimetypes
 import os
+import time
+from services.advisory_data import pesticide_recommendations
+from utils.disease_helpers import run_model
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,10 +25,6 @@ except Exception as e:
     logger.error(f"Error loading TFLite model: {str(e)}")
     raise HTTPException(status_code=500, detail=f"Error loading model: {str(e)}")
 
-# Get input and output details
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
-
 # Get class labels from PlantVillage dataset
 try:
     if not os.path.exists("dataset/plantvillage/"):
@@ -39,20 +38,77 @@ except Exception as e:
     logger.error(f"Error loading PlantVillage labels: {str(e)}")
     raise HTTPException(status_code=500, detail=f"Error loading dataset labels: {str(e)}")
 
-# Pesticide recommendation database
-pesticide_recommendations = {
-    "Tomato___healthy": "No treatment needed; maintain regular care.",
-    "Tomato___Bacterial_spot": "Apply copper-based bactericides like Kocide 3000.",
-    "Tomato___Early_blight": "Apply chlorothalonil or mancozeb; rotate crops.",
-    "Tomato___Late_blight": "Apply fungicides like Ridomil Gold; remove affected leaves.",
-    "Corn___healthy": "No treatment needed; maintain regular care.",
-    "Corn___Common_rust": "Use fungicides like azoxystrobin; improve air circulation.",
-    "Corn___Northern_Leaf_Blight": "Apply propiconazole; ensure crop rotation.",
-    "Potato___healthy": "No treatment needed; maintain regular care.",
-    "Potato___Early_blight": "Apply chlorothalonil or mancozeb; rotate crops.",
-    "Potato___Late_blight": "Use metalaxyl-based fungicides; avoid overhead irrigation."
+# Optional first-stage model for cascade inference, e.g. trained with
+# `python train_disease_model.py --image-size 128 --alpha 0.35 --output ml/disease_model_small`
+CASCADE_MODEL_PATH = os.getenv("DISEASE_CASCADE_MODEL", "ml/disease_model_small.tflite")
+CASCADE_THRESHOLD = float(os.getenv("DISEASE_CASCADE_THRESHOLD", "0.9"))
+
+cascade_interpreter = None
+if os.getenv("DISEASE_CASCADE", "1") != "0" and os.path.exists(CASCADE_MODEL_PATH):
+    try:
+        cascade_interpreter = tf.lite.Interpreter(model_path=CASCADE_MODEL_PATH)
+        cascade_interpreter.allocate_tensors()
+        logger.info(f"Cascade model loaded from {CASCADE_MODEL_PATH} (threshold {CASCADE_THRESHOLD})")
+    except Exception as e:
+        # The full model still answers every request without the cascade
+        logger.error(f"Error loading cascade model, cascade disabled: {str(e)}")
+        cascade_interpreter = None
+
+# A first-stage model trained on a different class set would map indices to the wrong diseases
+if cascade_interpreter is not None:
+    cascade_classes = int(cascade_interpreter.get_output_details()[0]['shape'][-1])
+    if cascade_classes != len(disease_labels):
+        logger.error(f"Cascade model predicts {cascade_classes} classes but {len(disease_labels)} labels are loaded, cascade disabled")
+        cascade_interpreter = None
+
+# Per-stage hit counts and inference time for the cascade
+cascade_stats = {
+    "small": {"hits": 0, "inference_ms": 0.0},
+    "full": {"hits": 0, "inference_ms": 0.0}
 }
 
+def classify_image(image):
+    # Cheap first stage answers confident images; uncertain ones escalate to the full model
+    stages = [("small", cascade_interpreter, CASCADE_THRESHOLD), ("full", interpreter, None)]
+    for stage, model_interpreter, threshold in stages:
+        if model_interpreter is None:
+            continue
+        start = time.perf_counter()
+        try:
+            output_data = run_model(model_interpreter, image)
+        except Exception as e:
+            if threshold is None:
+                raise
+            # A failing first stage must not fail the request while the full model is available
+            logger.error(f"Stage {stage} failed, escalating: {str(e)}")
+            continue
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        predicted_index = int(np.argmax(output_data))
+        confidence = float(output_data[predicted_index])
+        logger.info(f"Stage {stage}: index {predicted_index}, confidence {confidence:.3f}, {elapsed_ms:.1f} ms")
+        cascade_stats[stage]["inference_ms"] += elapsed_ms
+        if threshold is None or confidence >= threshold:
+            cascade_stats[stage]["hits"] += 1
+            return predicted_index, confidence, stage
+
+def get_cascade_stats():
+    total = sum(s["hits"] for s in cascade_stats.values())
+    total_ms = sum(s["inference_ms"] for s in cascade_stats.values())
+    return {
+        "enabled": cascade_interpreter is not None,
+        "threshold": CASCADE_THRESHOLD,
+        "total_images": total,
+        "avg_inference_ms": round(total_ms / total, 2) if total else 0.0,
+        "stages": {
+            stage: {
+                "hits": s["hits"],
+                "hit_rate": round(s["hits"] / total, 4) if total else 0.0,
+                "inference_ms": round(s["inference_ms"], 2)
+            }
+            for stage, s in cascade_stats.items()
+        }
+    }
+
 async def predict_disease(file: UploadFile):
     try:
         # Validate file extension
@@ -80,10 +136,8 @@ async def predict_disease(file: UploadFile):
             image = Image.open(image_stream)
             image.verify()  # Verify image integrity
             image_stream.seek(0)  # Reset stream pointer
-            image = Image.open(image_stream).convert('RGB').resize((224, 224))
+            image = Image.open(image_stream).convert('RGB')
             logger.info(f"Image format: {image.format}, Size: {image.size}, Mode: {image.mode}")
-            image_array = np.array(image, dtype=np.float32) / 255.0
-            image_array = np.expand_dims(image_array, axis=0)
         except UnidentifiedImageError as e:
             logger.error(f"UnidentifiedImageError: {str(e)}")
             raise HTTPException(status_code=400, detail="Invalid or corrupted image file. Please upload a valid JPEG or PNG image.")
@@ -91,26 +145,19 @@ async def predict_disease(file: UploadFile):
             logger.error(f"Image processing error: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
-        # Set input tensor
-        interpreter.set_tensor(input_details[0]['index'], image_array)
-
-        # Run inference
-        interpreter.invoke()
-
-        # Get output
-        output_data = interpreter.get_tensor(output_details[0]['index'])
-        predicted_index = np.argmax(output_data[0])
-        confidence = float(output_data[0][predicted_index])
+        # Run inference (cascade when a first-stage model is available)
+        predicted_index, confidence, stage = classify_image(image)
 
         # Get recommendation
         disease = disease_labels[predicted_index]
         recommendation = pesticide_recommendations.get(disease, f"Consult local agricultural extension services for {disease}.")
-        logger.info(f"Prediction: {disease}, Confidence: {confidence}")
+        logger.info(f"Prediction: {disease}, Confidence: {confidence}, Stage: {stage}")
 
         return {
             "disease": disease,
             "confidence": confidence,
-            "recommendation": recommendation
+            "recommendation": recommendation,
+            "stage": stage
         }
     except Exception as e:
         logger.error(f"Unexpected error in predict_disease: {str(e)}")
@@ -0,0 +1,184 @@
+import numpy as np
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from services.advisory_data import gov_schemes, crop_data, pesticide_recommendations
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = "knowledge"
+INDEX_PATH = "ml/knowledge_index.json"
+VECTORS_PATH = "ml/knowledge_vectors.npy"
+VECTOR_DIM = 256
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "in", "is",
+    "it", "my", "of", "on", "or", "should", "so", "the", "to", "what", "when", "which", "with", "you", "your"
+}
+
+def tokenize(text: str):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+def load_corpus(knowledge_dir: str = KNOWLEDGE_DIR):
+    # Advisory tables first, then every guide in the knowledge directory
+    passages = []
+    for crop, schemes in gov_schemes.items():
+        passages.append({
+            "source": "gov_schemes",
+            "title": f"Government schemes for {crop}",
+            "text": f"Government schemes relevant for {crop} farmers: {', '.join(schemes)}."
+        })
+    for crop, data in crop_data.items():
+        passages.append({
+            "source": "crop_data",
+            "title": f"{crop} economics",
+            "text": (f"{crop}: typical base yield {data['base_yield']} kg, cultivation cost about "
+                     f"₹{data['cost_per_kg']} per kg, sustainability factor {data['sustainability_factor']}.")
+        })
+    for disease, recommendation in pesticide_recommendations.items():
+        crop, condition = disease.split("___", 1)
+        condition = condition.replace("_", " ")
+        passages.append({
+            "source": "pesticide_recommendations",
+            "title": f"{crop} {condition}",
+            "text": f"{crop} {condition}: {recommendation}"
+        })
+
+    if os.path.isdir(knowledge_dir):
+        for filename in sorted(os.listdir(knowledge_dir)):
+            path = os.path.join(knowledge_dir, filename)
+            if filename.endswith(".md"):
+                with open(path, encoding="utf-8") as f:
+                    # One passage per "## " section; text before the first section is ignored
+                    for section in re.split(r"^## ", f.read(), flags=re.M)[1:]:
+                        title, _, body = section.partition("\n")
+                        passages.append({"source": filename, "title": title.strip(), "text": " ".join(body.split())})
+            elif filename.endswith(".txt"):
+                with open(path, encoding="utf-8") as f:
+                    for paragraph in re.split(r"\n\s*\n", f.read()):
+                        if paragraph.strip():
+                            passages.append({"source": filename, "title": filename, "text": " ".join(paragraph.split())})
+
+    for i, passage in enumerate(passages):
+        passage["id"] = i
+    return passages
+
+def corpus_hash(passages):
+    return hashlib.md5(json.dumps(passages, sort_keys=True).encode()).hexdigest()
+
+def embed(text: str, dim: int = VECTOR_DIM):
+    # Hashed unigram/bigram embedding: deterministic, needs no model download
+    tokens = tokenize(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = zlib.crc32(feature.encode())
+        vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class KnowledgeBase:
+    def __init__(self, passages, postings, doc_lengths, vectors=None, source_hash=None):
+        self.passages = passages
+        self.postings = postings  # term -> [[passage id, term frequency], ...]
+        self.doc_lengths = doc_lengths
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self.vectors = vectors
+        self.source_hash = source_hash
+        n = len(passages)
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in postings.items()}
+
+    @classmethod
+    def build(cls, passages, with_vectors: bool = True):
+        postings, doc_lengths = {}, []
+        for passage in passages:
+            tokens = tokenize(f"{passage['title']} {passage['text']}")
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append([passage["id"], tf])
+        vectors = None
+        if with_vectors:
+            vectors = np.stack([embed(f"{p['title']} {p['text']}") for p in passages]).astype(np.float16)
+        return cls(passages, postings, doc_lengths, vectors, corpus_hash(passages))
+
+    def save(self, index_path: str = INDEX_PATH, vectors_path: str = VECTORS_PATH):
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "corpus_hash": self.source_hash,
+                "passages": self.passages,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths
+            }, f, ensure_ascii=False)
+        if self.vectors is not None:
+            np.save(vectors_path, self.vectors)
+
+    @classmethod
+    def load(cls, index_path: str = INDEX_PATH, vectors_path: str = VECTORS_PATH):
+        with open(index_path, encoding="utf-8") as f:
+            data = json.load(f)
+        vectors = None
+        if os.path.exists(vectors_path):
+            # Memory-mapped so startup does not copy the vector index into RAM
+            vectors = np.load(vectors_path, mmap_mode="r")
+            if vectors.shape[0] != len(data["passages"]):
+                logger.warning(f"Vector index {vectors_path} does not match {index_path}, ignoring it")
+                vectors = None
+        return cls(data["passages"], data["postings"], data["doc_lengths"], vectors, data.get("corpus_hash"))
+
+    def bm25(self, query: str):
+        scores = Counter()
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / self.avg_length
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+        return scores
+
+    def search(self, query: str, k: int = 3):
+        bm25_scores = self.bm25(query)
+        if self.vectors is None or not bm25_scores:
+            ranking = [doc_id for doc_id, _ in bm25_scores.most_common()]
+        else:
+            # The hashed embedding has no semantic signal, so it only orders passages whose
+            # BM25 scores are equal and never changes the keyword ranking otherwise
+            similarities = np.asarray(self.vectors @ embed(query).astype(np.float16), dtype=np.float32)
+            ranking = sorted(bm25_scores, key=lambda doc_id: (-round(bm25_scores[doc_id], 9), -similarities[doc_id], doc_id))
+        return [self.passages[doc_id] for doc_id in ranking[:k]]
+
+knowledge_base = None
+
+def init_knowledge_base(index_path: str = INDEX_PATH, vectors_path: str = VECTORS_PATH):
+    # Load the prebuilt index, or build it in memory if it is missing or stale
+    global knowledge_base
+    passages = load_corpus()
+    if os.path.exists(index_path):
+        try:
+            loaded = KnowledgeBase.load(index_path, vectors_path)
+            if loaded.source_hash == corpus_hash(passages):
+                knowledge_base = loaded
+                logger.info(f"Knowledge base loaded: {len(passages)} passages")
+                return knowledge_base
+            logger.warning(f"{index_path} is stale, run build_knowledge_base.py to refresh it")
+        except Exception as e:
+            logger.error(f"Error loading knowledge base index: {str(e)}")
+    knowledge_base = KnowledgeBase.build(passages)
+    logger.info(f"Knowledge base built in memory: {len(passages)} passages")
+    return knowledge_base
+
+def search_knowledge_base(query: str, k: int = 3):
+    if knowledge_base is None:
+        init_knowledge_base()
+    return knowledge_base.search(query, k)
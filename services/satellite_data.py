@@ -4,6 +4,7 @@ from fastapi import HTTPException
 import numpy as np
 import logging
 from pathlib import Path
+from services.vegetation_index import compute_ndvi
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -66,7 +67,23 @@ def estimate_awc(sand, clay, soc):
 def estimate_nitrogen(soc):
     return (soc / 12) * 1000  # mg/kg
 
+# Used when no cloud-free local scene covers the farm
+DEFAULT_NDVI = 0.51
+
+def fetch_ndvi(coordinates: dict, date_range: dict, buffer: float = 0.01):
+    try:
+        result = compute_ndvi(coordinates["lat"], coordinates["lon"], buffer, date_range)
+        if result:
+            logger.info(f"NDVI from {len(result['series'])} scenes: {result['ndvi']} (latest {result['latest_ndvi']})")
+            return result["ndvi"]
+        logger.warning("No cloud-free scenes for the farm; using default NDVI")
+    except Exception as e:
+        logger.error(f"Error computing NDVI: {str(e)}")
+    return DEFAULT_NDVI
+
 def fetch_soil_data(coordinates: dict, date_range: dict):
+    ndvi = fetch_ndvi(coordinates, date_range)
+    health_status = "Healthy" if ndvi > 0.6 else "Stressed"
     try:
         lat, lon = coordinates["lat"], coordinates["lon"]
         if not (-90 <= lat <= 90 and -180 <= lon <= 180):
@@ -81,9 +98,7 @@ def fetch_soil_data(coordinates: dict, date_range: dict):
         awc_data = estimate_awc(sand_data, clay_data, soc_data)
         nitrogen_data = estimate_nitrogen(soc_data)
 
-        ndvi = 0.51
         org_carbon = soc_data / 10
-        health_status = "Healthy" if ndvi > 0.6 else "Stressed"
 
         return {
             "ndvi": ndvi,
@@ -93,15 +108,15 @@ def fetch_soil_data(coordinates: dict, date_range: dict):
             "soil_org_carbon": float(org_carbon),
             "soil_water_content": float(awc_data),
             "recommendation": (
-                f"Crop health: {health_status}. Monitor irrigation (AWC: {awc_data:.2f}%). "
+                f"Crop health: {health_status} (NDVI {ndvi:.2f}). Monitor irrigation (AWC: {awc_data:.2f}%). "
                 f"Adjust pH ({ph_data/10:.2f}) and nitrogen ({nitrogen_data:.2f} mg/kg) if needed."
             )
         }
     except Exception as e:
         logger.error(f"Failed to fetch soil data: {str(e)}")
         return {
-            "ndvi": 0.51,
-            "health_status": "Stressed",
+            "ndvi": ndvi,
+            "health_status": health_status,
             "soil_ph": 6.5,
             "soil_nitrogen": 100.0,
             "soil_org_carbon": 1.65,
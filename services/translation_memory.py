@@ -0,0 +1,127 @@
+import sqlite3
+import re
+import logging
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sentence boundaries: ., ! or ? followed by whitespace (so decimals like 6.5 are not split)
+SEGMENT_BOUNDARY = re.compile(r"((?<=[.!?])\s+)")
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+# Eviction runs only once the store grows this fraction past max_entries, then trims a whole batch
+EVICT_HEADROOM = 0.1
+
+def split_segments(text: str):
+    # Returns alternating [segment, separator, segment, ...] so join() restores the text exactly
+    return SEGMENT_BOUNDARY.split(text)
+
+class TranslationMemory:
+    def __init__(self, backend, db_path: str = "cache.db", max_entries: int = 50000):
+        # backend(segments: list[str], target_language: str) -> list[str], called once per response
+        self.backend = backend
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.high_water = int(max_entries * (1 + EVICT_HEADROOM))
+        self.stats = {"segment_hits": 0, "segment_misses": 0, "backend_calls": 0}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS translation_memory (
+                language TEXT,
+                source TEXT,
+                translation TEXT,
+                last_used TEXT,
+                PRIMARY KEY (language, source)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS translation_memory_last_used ON translation_memory (last_used)")
+        cursor.execute("SELECT COUNT(*) FROM translation_memory")
+        self.entry_count = cursor.fetchone()[0]  # Upper bound, recounted only when evicting
+        conn.commit()
+        conn.close()
+
+    def translate(self, text: str, target_language: str) -> str:
+        return self.translate_pieces([(text, True)], target_language)[0]
+
+    def translate_pieces(self, pieces: list, target_language: str) -> list:
+        # pieces are (text, persist) pairs. Persisted text is split into sentences and cached;
+        # transient text (e.g. a sentence echoing the user's message) is translated whole in
+        # the same backend call but never stored, so it cannot push reusable advice out.
+        splits = [split_segments(text) if persist else None for text, persist in pieces]
+        segments = list(dict.fromkeys(p for parts in splits if parts for p in parts[::2] if p.strip()))
+        transient = list(dict.fromkeys(text for text, persist in pieces if not persist and text.strip()))
+        if not segments and not transient:
+            return [text for text, _ in pieces]
+
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            translated = {}
+            for i in range(0, len(segments), LOOKUP_CHUNK):
+                chunk = segments[i:i + LOOKUP_CHUNK]
+                cursor.execute(
+                    f"SELECT source, translation FROM translation_memory WHERE language = ? AND source IN ({','.join('?' * len(chunk))})",
+                    [target_language] + chunk
+                )
+                translated.update(cursor.fetchall())
+
+            misses = [s for s in segments if s not in translated]
+            self.stats["segment_hits"] += len(segments) - len(misses)
+            self.stats["segment_misses"] += len(misses)
+            transient_translations = {}
+            if misses or transient:
+                # All cache misses and transient text go to the backend in a single batch
+                batch = misses + transient
+                results = self.backend(batch, target_language)
+                self.stats["backend_calls"] += 1
+                if len(results) != len(batch):
+                    raise ValueError(f"Translation backend returned {len(results)} segments for {len(batch)}")
+                translated.update(zip(misses, results[:len(misses)]))
+                transient_translations = dict(zip(transient, results[len(misses):]))
+                if misses:
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO translation_memory (language, source, translation, last_used) VALUES (?, ?, ?, ?)",
+                        [(target_language, s, translated[s], now) for s in misses]
+                    )
+                    self.entry_count += len(misses)
+            missed = set(misses)
+            hits = [s for s in segments if s not in missed]
+            if hits:
+                cursor.executemany(
+                    "UPDATE translation_memory SET last_used = ? WHERE language = ? AND source = ?",
+                    [(now, target_language, s) for s in hits]
+                )
+            if self.entry_count > self.high_water:
+                self._evict(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+
+        logger.info(f"Translation memory ({target_language}): {len(segments) - len(misses)} hits, "
+                    f"{len(misses)} misses, {len(transient)} transient")
+        output = []
+        for (text, persist), parts in zip(pieces, splits):
+            if persist:
+                output.append("".join(translated.get(p, p) if i % 2 == 0 else p for i, p in enumerate(parts)))
+            else:
+                output.append(transient_translations.get(text, text))
+        return output
+
+    def _evict(self, cursor):
+        # Keep the store bounded by dropping the least recently used segments (uses the last_used index)
+        cursor.execute("SELECT COUNT(*) FROM translation_memory")
+        count = cursor.fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            cursor.execute(
+                "DELETE FROM translation_memory WHERE rowid IN "
+                "(SELECT rowid FROM translation_memory ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"Translation memory: evicted {excess} least recently used segments")
+        self.entry_count = min(count, self.max_entries)
@@ -0,0 +1,247 @@
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window, from_bounds
+from collections import OrderedDict
+from datetime import date, datetime
+import logging
+import os
+import re
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Local directory of multispectral scenes, e.g. Sentinel-2 L2A products or band GeoTIFFs:
+# data/sentinel2/S2A_MSIL2A_20240115T052141_..._T43QGU.SAFE/GRANULE/.../IMG_DATA/R10m/T43QGU_20240115T052141_B04_10m.jp2
+# data/sentinel2/scene_a/T43QGU_20240115_B04.tif, ..._B08.tif, ..._SCL.tif
+SCENES_DIR = os.getenv("SENTINEL2_DIR", "data/sentinel2")
+RED_BAND = "B04"
+NIR_BAND = "B08"
+CLOUD_BAND = "SCL"
+
+# L2A products from processing baseline 04.00 store reflectance with a -1000 offset (BOA_ADD_OFFSET).
+# It is applied only when the product metadata or name proves it; loose GeoTIFFs may already be
+# harmonised, so they get no offset unless S2_REFLECTANCE_OFFSET is set (which overrides every scene).
+REFLECTANCE_OFFSET_OVERRIDE = os.getenv("S2_REFLECTANCE_OFFSET")
+BASELINE_04_OFFSET = -1000.0
+
+# Scene classification values masked out: no data, saturated, cloud shadow, clouds, cirrus
+CLOUD_CLASSES = [0, 1, 3, 8, 9, 10]
+
+# Scenes with fewer clear pixels than this around the farm are dropped from the series
+MIN_VALID_FRACTION = 0.2
+
+# Number of scenes read into one (time, rows, cols) stack
+STACK_CHUNK = 16
+
+# Per-tile results: (scene, mtime, bounds) -> {"date", "ndvi", "valid_fraction"}
+TILE_CACHE_SIZE = 4096
+tile_cache = OrderedDict()
+
+DATE_PATTERN = re.compile(r"(20\d{2})(\d{2})(\d{2})(?:T\d{6})?")
+TILE_PATTERN = re.compile(r"(?<![A-Z0-9])T\d{2}[A-Z]{3}(?![A-Z0-9])")
+BASELINE_PATTERN = re.compile(r"_N(\d{4})_")
+BOA_OFFSET_PATTERN = re.compile(r"<BOA_ADD_OFFSET[^>]*>\s*(-?\d+(?:\.\d+)?)\s*<")
+BAND_PATTERN = re.compile(r"(?<![A-Z0-9])(B04|B08|SCL)(?:_(\d+)m)?(?![A-Z0-9])")
+
+# Scene listing, rescanned when the scenes directory or one of its entries changes
+scene_listing = {"dir": None, "signature": None, "scenes": []}
+
+def refresh_band_mtimes(scenes):
+    # Band files overwritten in place (e.g. inside a .SAFE tree) do not change the directory
+    # signature, so their mtimes are rechecked; returns False if a band file disappeared
+    try:
+        for scene in scenes:
+            scene["mtime"] = max(os.path.getmtime(p) for p in scene["bands"].values())
+    except OSError:
+        return False
+    return True
+
+def find_scenes(scenes_dir: str = SCENES_DIR):
+    # Cheap signature: the scenes directory and its direct entries, instead of walking every file
+    if not os.path.isdir(scenes_dir):
+        return []
+    signature = (os.path.getmtime(scenes_dir),
+                 tuple(sorted((e.name, e.stat().st_mtime) for e in os.scandir(scenes_dir))))
+    if (scene_listing["dir"] == scenes_dir and scene_listing["signature"] == signature
+            and refresh_band_mtimes(scene_listing["scenes"])):
+        return scene_listing["scenes"]
+
+    # Group band files by granule: tile ID (or top-level scene directory) plus acquisition date.
+    # This keeps R10m B04/B08 and R20m SCL of a .SAFE product together.
+    scenes = {}
+    for root, _, files in os.walk(scenes_dir):
+        for filename in files:
+            if not filename.lower().endswith((".tif", ".tiff", ".jp2")):
+                continue
+            band_match = BAND_PATTERN.search(filename)
+            path = os.path.join(root, filename)
+            relative_path = os.path.relpath(path, scenes_dir)
+            date_match = DATE_PATTERN.search(filename) or DATE_PATTERN.search(relative_path)
+            if not band_match or not date_match:
+                continue
+            try:
+                acquired = date(*map(int, date_match.groups()))
+            except ValueError:  # An 8-digit run that is not a real date, e.g. 20241399
+                logger.warning(f"Skipping {path}: no valid acquisition date in its name")
+                continue
+            tile_match = TILE_PATTERN.search(filename) or TILE_PATTERN.search(relative_path)
+            group = tile_match.group(0) if tile_match else relative_path.split(os.sep)[0]
+            key = f"{group}_{date_match.group(0)}"
+            scene = scenes.setdefault(key, {"key": key, "date": acquired, "bands": {}, "res": {}})
+            band, resolution = band_match.group(1), int(band_match.group(2) or 0)
+            # Products ship several resolutions of a band; keep the finest one
+            if band not in scene["bands"] or resolution < scene["res"][band]:
+                scene["bands"][band] = path
+                scene["res"][band] = resolution
+
+    result = []
+    for scene in scenes.values():
+        if RED_BAND not in scene["bands"] or NIR_BAND not in scene["bands"]:
+            continue
+        scene["offset"] = reflectance_offset(scene, scenes_dir)
+        result.append(scene)
+    refresh_band_mtimes(result)
+    result.sort(key=lambda s: s["date"])
+    scene_listing.update({"dir": scenes_dir, "signature": signature, "scenes": result})
+    logger.info(f"Found {len(result)} scenes in {scenes_dir}")
+    return result
+
+def reflectance_offset(scene, scenes_dir: str):
+    if REFLECTANCE_OFFSET_OVERRIDE is not None:
+        return float(REFLECTANCE_OFFSET_OVERRIDE)
+    # BOA_ADD_OFFSET from the product metadata, searched from the band folder up to the scenes directory
+    root = os.path.abspath(scenes_dir)
+    directory = os.path.abspath(os.path.dirname(scene["bands"][RED_BAND]))
+    while directory.startswith(root):
+        metadata_path = os.path.join(directory, "MTD_MSIL2A.xml")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8", errors="ignore") as f:
+                match = BOA_OFFSET_PATTERN.search(f.read())
+            if match:
+                return float(match.group(1))
+        if directory == root:
+            break
+        directory = os.path.dirname(directory)
+    # Processing baseline in the product name, e.g. S2A_MSIL2A_20240115T052141_N0510_...
+    match = BASELINE_PATTERN.search(os.path.relpath(scene["bands"][RED_BAND], scenes_dir))
+    if match:
+        return BASELINE_04_OFFSET if int(match.group(1)) >= 400 else 0.0
+    return 0.0
+
+def parse_date_range(date_range: dict):
+    date_range = date_range or {}
+    start = date_range.get("start") or date_range.get("start_date")
+    end = date_range.get("end") or date_range.get("end_date")
+    start = datetime.fromisoformat(start).date() if start else date.min
+    end = datetime.fromisoformat(end).date() if end else date.max
+    return start, end
+
+def read_window(path: str, bounds, out_shape=None, resampling=Resampling.nearest):
+    # Read only the pixels covering the lon/lat bounds, never the whole scene
+    with rasterio.open(path) as src:
+        left, bottom, right, top = transform_bounds("EPSG:4326", src.crs, *bounds)
+        window = from_bounds(left, bottom, right, top, transform=src.transform)
+        window = window.round_offsets().round_lengths()
+        window = window.intersection(Window(0, 0, src.width, src.height))
+        data = src.read(1, window=window, out_shape=out_shape, resampling=resampling, masked=True)
+    return data
+
+def scene_ndvi_stack(scenes, bounds):
+    # Read the red/NIR windows of several scenes and compute NDVI over the whole stack at once
+    red, nir, clear, kept = [], [], [], []
+    for scene in scenes:
+        try:
+            red_window = read_window(scene["bands"][RED_BAND], bounds)
+            if red_window.size == 0:
+                continue
+            shape = red_window.shape
+            nir_window = read_window(scene["bands"][NIR_BAND], bounds, out_shape=shape, resampling=Resampling.bilinear)
+            mask = np.ma.getmaskarray(red_window) | np.ma.getmaskarray(nir_window)
+            if CLOUD_BAND in scene["bands"]:
+                # The classification band is coarser (20 m); resample it onto the red band grid
+                scl = read_window(scene["bands"][CLOUD_BAND], bounds, out_shape=shape)
+                mask |= np.ma.getmaskarray(scl) | np.isin(scl.filled(0), CLOUD_CLASSES)
+        except Exception as e:  # Scene does not cover the farm or one of its bands cannot be read
+            logger.info(f"Skipping scene {scene['key']}: {str(e)}")
+            continue
+        red_values = red_window.filled(0).astype(np.float32) + scene["offset"]
+        nir_values = nir_window.filled(0).astype(np.float32) + scene["offset"]
+        clear_pixels = ~mask
+        if scene["offset"] and clear_pixels.any():
+            negative = ((red_values < 0) | (nir_values < 0))[clear_pixels].mean()
+            if negative > 0.5:
+                logger.warning(f"Reflectance offset {scene['offset']} makes {negative:.0%} of clear pixels negative in "
+                               f"scene {scene['key']}; the data may already be harmonised (check S2_REFLECTANCE_OFFSET)")
+        red.append(red_values)
+        nir.append(nir_values)
+        clear.append(~mask)
+        kept.append(scene)
+
+    results = {}
+    # Window shapes differ between tiles/projections, so stack scenes sharing a shape
+    by_shape = {}
+    for i in range(len(kept)):
+        by_shape.setdefault(red[i].shape, []).append(i)
+    for indices in by_shape.values():
+        red_stack = np.stack([red[i] for i in indices])
+        nir_stack = np.stack([nir[i] for i in indices])
+        clear_stack = np.stack([clear[i] for i in indices])
+        denominator = nir_stack + red_stack
+        clear_stack &= (denominator > 0) & (red_stack >= 0) & (nir_stack >= 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ndvi = np.where(clear_stack, (nir_stack - red_stack) / denominator, 0.0)
+        valid_counts = clear_stack.sum(axis=(1, 2))
+        valid_fraction = valid_counts / clear_stack[0].size
+        ndvi_sums = ndvi.sum(axis=(1, 2))
+        for i, total, count, fraction in zip(indices, ndvi_sums, valid_counts, valid_fraction):
+            results[kept[i]["key"]] = {
+                "date": kept[i]["date"].isoformat(),
+                "ndvi": round(float(total / count), 4) if count else None,
+                "valid_fraction": round(float(fraction), 4)
+            }
+    return results
+
+def tile_cache_key(scene, bounds):
+    return (scene["key"], scene["mtime"], tuple(round(b, 6) for b in bounds))
+
+def compute_ndvi(lat: float, lon: float, buffer: float, date_range: dict, scenes_dir: str = SCENES_DIR):
+    start, end = parse_date_range(date_range)
+    scenes = [s for s in find_scenes(scenes_dir) if start <= s["date"] <= end]
+    if not scenes:
+        logger.info(f"No scenes in {scenes_dir} between {start} and {end}")
+        return None
+    bounds = (lon - buffer, lat - buffer, lon + buffer, lat + buffer)
+
+    series, pending = {}, []
+    for scene in scenes:
+        key = tile_cache_key(scene, bounds)
+        if key in tile_cache:
+            tile_cache.move_to_end(key)
+            series[scene["key"]] = tile_cache[key]
+        else:
+            pending.append((key, scene))
+
+    for i in range(0, len(pending), STACK_CHUNK):
+        chunk = pending[i:i + STACK_CHUNK]
+        computed = scene_ndvi_stack([scene for _, scene in chunk], bounds)
+        for key, scene in chunk:
+            # Scenes that do not cover the farm are cached too, so they are not re-read
+            result = computed.get(scene["key"], {"date": scene["date"].isoformat(), "ndvi": None, "valid_fraction": 0.0})
+            tile_cache[key] = result
+            series[scene["key"]] = result
+            if len(tile_cache) > TILE_CACHE_SIZE:
+                tile_cache.popitem(last=False)
+    logger.info(f"NDVI for ({lat}, {lon}): {len(scenes) - len(pending)} cached tiles, {len(pending)} read")
+
+    valid = [r for r in series.values() if r["ndvi"] is not None and r["valid_fraction"] >= MIN_VALID_FRACTION]
+    if not valid:
+        return None
+    valid.sort(key=lambda r: r["date"])
+    values = [r["ndvi"] for r in valid]
+    return {
+        "ndvi": round(float(np.median(values)), 4),
+        "latest_ndvi": values[-1],
+        "series": valid
+    }
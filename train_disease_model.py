@@ -1,68 +1,202 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+import numpy as np
+import argparse
+import json
 import os
+from utils.disease_helpers import split_dataset
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Command line options
+parser = argparse.ArgumentParser(description="Train the MobileNetV2 disease model")
+parser.add_argument("--mode", choices=["pipeline", "features"], default="pipeline",
+                    help="'pipeline' trains on augmented images, 'features' trains the head on cached backbone embeddings")
+parser.add_argument("--dataset", default="dataset/plantvillage/", help="Path to the dataset")
+parser.add_argument("--image-size", type=int, default=224, help="Square input resolution (96, 128, 160, 192 or 224)")
+parser.add_argument("--alpha", type=float, default=1.0, help="MobileNetV2 width multiplier (0.35, 0.5, 0.75, 1.0, ...)")
+parser.add_argument("--batch-size", type=int, default=32)
+parser.add_argument("--epochs", type=int, default=5)
+parser.add_argument("--cache-dir", default="ml/cache", help="Where decoded images and backbone features are cached")
+parser.add_argument("--output", default="ml/disease_model", help="Output path without extension (.h5 and .tflite are written)")
+args = parser.parse_args()
 
 # Define dataset path and parameters
-dataset_path = "dataset/plantvillage/"  # Path to the dataset
-image_size = (224, 224)
-batch_size = 32
-
-# Data augmentation and preprocessing
-train_datagen = ImageDataGenerator(
-    rescale=1./255,
-    rotation_range=20,
-    width_shift_range=0.2,
-    height_shift_range=0.2,
-    shear_range=0.2,
-    zoom_range=0.2,
-    horizontal_flip=True,
-    fill_mode='nearest',
-    validation_split=0.2  # 20% for validation
-)
-
-# Load dataset
-train_generator = train_datagen.flow_from_directory(
-    dataset_path,
-    target_size=image_size,
-    batch_size=batch_size,
-    class_mode='sparse',
-    subset='training'
-)
-
-validation_generator = train_datagen.flow_from_directory(
-    dataset_path,
-    target_size=image_size,
-    batch_size=batch_size,
-    class_mode='sparse',
-    subset='validation'
-)
-
-# Get number of classes
-num_classes = len(train_generator.class_indices)
-
-# Build MobileNet-based model
-base_model = tf.keras.applications.MobileNetV2(input_shape=(224, 224, 3), include_top=False, weights='imagenet')
-base_model.trainable = False  # Freeze base model
-
-model = models.Sequential([
-    base_model,
-    layers.GlobalAveragePooling2D(),
-    layers.Dense(128, activation='relu'),
-    layers.Dense(num_classes, activation='softmax')
+dataset_path = args.dataset
+image_size = (args.image_size, args.image_size)
+batch_size = args.batch_size
+
+# 80/20 split decided per file, so existing images keep their subset when new ones are added
+class_names, (train_paths, train_labels), (val_paths, val_labels) = split_dataset(dataset_path, validation_split=0.2)
+train_labels = np.array(train_labels, dtype=np.int32)
+val_labels = np.array(val_labels, dtype=np.int32)
+num_classes = len(class_names)
+print(f"Found {len(train_paths) + len(val_paths)} images belonging to {num_classes} classes "
+      f"({len(train_paths)} training, {len(val_paths)} validation).")
+
+class FileCache:
+    # Per-file rows (decoded images or embeddings) keyed by path and mtime, stored in
+    # append-only memory-mapped .npy shards. New or modified files go into a new shard.
+    def __init__(self, name, row_shape, dtype):
+        self.dir = os.path.join(args.cache_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.index_path = os.path.join(self.dir, "index.json")
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.entries = {}  # path -> [shard file, row, mtime]
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.entries = json.load(f)
+        self.shards = {}
+
+    def missing(self, paths):
+        missing = []
+        for path in paths:
+            entry = self.entries.get(path)
+            if entry is None or entry[2] != os.path.getmtime(path):
+                missing.append(path)
+        return missing
+
+    def add(self, paths, batches):
+        shard_name = f"shard_{max([int(e[0][6:11]) for e in self.entries.values()] or [-1]) + 1:05d}.npy"
+        shard_path = os.path.join(self.dir, shard_name)
+        rows = np.lib.format.open_memmap(shard_path + ".tmp", mode='w+', dtype=self.dtype,
+                                         shape=(len(paths),) + self.row_shape)
+        offset = 0
+        for batch in batches:
+            rows[offset:offset + len(batch)] = batch
+            offset += len(batch)
+        rows.flush()
+        del rows
+        os.replace(shard_path + ".tmp", shard_path)
+        for row, path in enumerate(paths):
+            self.entries[path] = [shard_name, row, os.path.getmtime(path)]
+
+        # Drop shards whose rows have all been superseded
+        live = {entry[0] for entry in self.entries.values()}
+        for filename in os.listdir(self.dir):
+            if filename.startswith("shard_") and filename.endswith(".npy") and filename not in live:
+                os.remove(os.path.join(self.dir, filename))
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump(self.entries, f)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def locate(self, paths):
+        return (np.array([self.entries[p][0] for p in paths]),
+                np.array([self.entries[p][1] for p in paths], dtype=np.int64))
+
+    def gather(self, shard_names, rows):
+        out = np.empty((len(rows),) + self.row_shape, dtype=self.dtype)
+        for shard_name in np.unique(shard_names):
+            if shard_name not in self.shards:
+                self.shards[shard_name] = np.load(os.path.join(self.dir, shard_name), mmap_mode='r')
+            selected = shard_names == shard_name
+            out[selected] = self.shards[shard_name][rows[selected]]
+        return out
+
+def load_image(path):
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, image_size)
+    # Keep decoded images as uint8 so the cache is 4x smaller than float32
+    return tf.cast(tf.round(image), tf.uint8)
+
+def rescale(image):
+    return tf.cast(image, tf.float32) / 255.0
+
+def fill_cache(cache, paths, transform=None):
+    # Decode (and optionally embed) only the files that are not cached yet
+    missing = cache.missing(paths)
+    if not missing:
+        return
+    print(f"Caching {len(missing)} new files in {cache.dir}")
+    ds = (tf.data.Dataset.from_tensor_slices(missing)
+          .map(load_image, num_parallel_calls=AUTOTUNE)
+          .batch(batch_size)
+          .prefetch(AUTOTUNE))
+    cache.add(missing, ((transform(batch) if transform else batch).numpy() for batch in ds))
+
+def cached_dataset(cache, paths, labels, shuffle):
+    # Batches are gathered straight from the memory-mapped shards instead of loading them whole
+    shard_names, rows = cache.locate(paths)
+
+    def gather(batch_indices):
+        batch_indices = np.sort(batch_indices)
+        return cache.gather(shard_names[batch_indices], rows[batch_indices]), labels[batch_indices]
+
+    ds = tf.data.Dataset.range(len(paths))
+    if shuffle:
+        ds = ds.shuffle(len(paths))
+    ds = ds.batch(batch_size).map(
+        lambda i: tf.numpy_function(gather, [i], (tf.as_dtype(cache.dtype), tf.int32)),
+        num_parallel_calls=AUTOTUNE)
+    return ds.map(lambda x, y: (tf.ensure_shape(x, (None,) + cache.row_shape), tf.ensure_shape(y, [None])))
+
+# Data augmentation runs inside the graph on whole batches.
+# ImageDataGenerator's shear_range=0.2 was a 0.2 degree shear, too small to matter, so it is not reproduced.
+augmentation = models.Sequential([
+    layers.RandomRotation(20 / 360, fill_mode='nearest'),
+    layers.RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+    layers.RandomZoom(0.2, fill_mode='nearest'),
+    layers.RandomFlip("horizontal"),
 ])
 
-# Compile and train
-model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-model.fit(train_generator, validation_data=validation_generator, epochs=5)
+def build_base_model():
+    base_model = tf.keras.applications.MobileNetV2(
+        input_shape=image_size + (3,), alpha=args.alpha, include_top=False, weights='imagenet')
+    base_model.trainable = False  # Freeze base model
+    return base_model
+
+def build_head():
+    return [
+        layers.Dense(128, activation='relu'),
+        layers.Dense(num_classes, activation='softmax')
+    ]
+
+def train_on_images(base_model):
+    images = FileCache(f"images_{args.image_size}", image_size + (3,), np.uint8)
+    fill_cache(images, train_paths + val_paths)
+    train_ds = (cached_dataset(images, train_paths, train_labels, shuffle=True)
+                .map(lambda x, y: (augmentation(rescale(x), training=True), y), num_parallel_calls=AUTOTUNE)
+                .prefetch(AUTOTUNE))
+    val_ds = (cached_dataset(images, val_paths, val_labels, shuffle=False)
+              .map(lambda x, y: (rescale(x), y), num_parallel_calls=AUTOTUNE)
+              .prefetch(AUTOTUNE))
+
+    model = models.Sequential([base_model, layers.GlobalAveragePooling2D()] + build_head())
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    model.fit(train_ds, validation_data=val_ds, epochs=args.epochs)
+    return model
+
+def train_on_features(base_model):
+    # Backbone embeddings are computed once per file; retraining only embeds new images
+    extractor = models.Sequential([base_model, layers.GlobalAveragePooling2D()])
+    features = FileCache(f"features_{args.image_size}_a{args.alpha}", extractor.output_shape[1:], np.float32)
+    fill_cache(features, train_paths + val_paths, transform=lambda batch: extractor(rescale(batch), training=False))
+
+    # Only the head is trained; no augmentation since the embeddings are computed once
+    head = models.Sequential([layers.Input(shape=features.row_shape)] + build_head())
+    head.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    head.fit(cached_dataset(features, train_paths, train_labels, shuffle=True).prefetch(AUTOTUNE),
+             validation_data=cached_dataset(features, val_paths, val_labels, shuffle=False).prefetch(AUTOTUNE),
+             epochs=args.epochs)
+
+    # Attach the trained head to the frozen backbone for export
+    return models.Sequential([base_model, layers.GlobalAveragePooling2D()] + head.layers)
+
+# Build MobileNet-based model and train
+base_model = build_base_model()
+if args.mode == "features":
+    model = train_on_features(base_model)
+else:
+    model = train_on_images(base_model)
 
 # Save the model
-model.save("ml/disease_model.h5")
+model.save(f"{args.output}.h5")
 
 # Convert to TensorFlow Lite
 converter = tf.lite.TFLiteConverter.from_keras_model(model)
 tflite_model = converter.convert()
-with open("ml/disease_model.tflite", "wb") as f:
+with open(f"{args.output}.tflite", "wb") as f:
     f.write(tflite_model)
 
-print("Disease model trained and saved as ml/disease_model.tflite")
\ No newline at end of file
+print(f"Disease model trained and saved as {args.output}.tflite")
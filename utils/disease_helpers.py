@@ -0,0 +1,42 @@
+import numpy as np
+import hashlib
+import os
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def list_images(dataset_path: str):
+    # Class indices follow the sorted directory names, same as flow_from_directory
+    class_names = sorted(d for d in os.listdir(dataset_path) if os.path.isdir(os.path.join(dataset_path, d)))
+    file_paths, labels = [], []
+    for index, class_name in enumerate(class_names):
+        class_dir = os.path.join(dataset_path, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                file_paths.append(os.path.join(class_dir, filename))
+                labels.append(index)
+    return class_names, file_paths, labels
+
+def is_validation(path: str, dataset_path: str, validation_split: float = 0.2):
+    # Decided per file from its relative path, so adding images never moves existing ones between subsets
+    relative_path = os.path.relpath(path, dataset_path).replace(os.sep, "/")
+    bucket = int(hashlib.md5(relative_path.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < validation_split
+
+def split_dataset(dataset_path: str, validation_split: float = 0.2):
+    # Returns class names and (paths, labels) for the training and validation subsets
+    class_names, file_paths, labels = list_images(dataset_path)
+    train, val = ([], []), ([], [])
+    for path, label in zip(file_paths, labels):
+        subset = val if is_validation(path, dataset_path, validation_split) else train
+        subset[0].append(path)
+        subset[1].append(label)
+    return class_names, train, val
+
+def run_model(model_interpreter, image):
+    # Resize a PIL RGB image to the TFLite model's own input resolution and return the softmax output
+    model_input = model_interpreter.get_input_details()[0]
+    height, width = model_input['shape'][1], model_input['shape'][2]
+    image_array = np.array(image.resize((width, height)), dtype=np.float32) / 255.0
+    model_interpreter.set_tensor(model_input['index'], np.expand_dims(image_array, axis=0))
+    model_interpreter.invoke()
+    return model_interpreter.get_tensor(model_interpreter.get_output_details()[0]['index'])[0]